@@ -0,0 +1,30 @@
+from unittest.mock import Mock
+
+# Attributes of ``requests.Response`` that handler.py reads. Response doubles are
+# restricted to exactly these names so a typo in a test fails loudly.
+RESPONSE_SPEC = ("status_code", "json", "content", "raise_for_status", "text", "headers")
+
+
+def make_response(status_code=200, json_data=None, raise_exc=None, **attrs):
+    """
+    Build a stand-in for ``requests.Response``.
+
+    Uses ``Mock(spec_set=RESPONSE_SPEC)``: stricter than a bare Mock and far
+    cheaper than MagicMock or ``autospec=True``, which introspect the real class.
+
+    Args:
+        status_code (int, optional): HTTP status code. Default is 200
+        json_data (optional): Value returned by ``response.json()``
+        raise_exc (Exception, optional): Raised by ``response.raise_for_status()``
+        **attrs: Any other attribute from RESPONSE_SPEC, e.g. ``content`` or ``text``
+
+    Returns:
+        Mock: The configured response double
+    """
+    response = Mock(spec_set=RESPONSE_SPEC)
+    response.status_code = status_code
+    response.json.return_value = json_data
+    response.raise_for_status.side_effect = raise_exc
+    for name, value in attrs.items():
+        setattr(response, name, value)
+    return response
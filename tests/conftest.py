@@ -0,0 +1,23 @@
+import pathlib
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+# Make sure that the repository root is in path so tests can import handler.py.
+# Done once here for the whole session instead of in every test module.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import handler
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    """Replace ``time.sleep`` as seen by handler so retries never wait.
+
+    Applied to every test; tests that care about the delays take ``no_sleep``
+    as an argument and assert on the returned mock.
+    """
+    mock = Mock()
+    monkeypatch.setattr(handler.time, "sleep", mock)
+    return mock
@@ -1,447 +1,487 @@
-import unittest
-from unittest.mock import patch, MagicMock, Mock
-import sys
-import os
+from unittest.mock import Mock
 import json
-import base64
 
-# Make sure that the root is in path so we can import handler.py
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+
 import handler
+from tests._mock_helpers import make_response
 
 # Local folder for test resources
 RUNPOD_WORKER_COMFY_TEST_RESOURCES_IMAGES = "./test_resources/images"
 
+# Base64 payload used by the upload_images tests, plain and as a data URI
+_TEST_IMAGE_B64 = "VGVzdCBJbWFnZSBEYXRh"  # base64 of b"Test Image Data"
+_TEST_IMAGE_DATA_URI = f"data:image/png;base64,{_TEST_IMAGE_B64}"
 
-class TestValidateInput(unittest.TestCase):
-    """Tests for the validate_input function."""
+# Expected validate_input results, shared between parametrize rows
+_EXPECTED_WORKFLOW_ONLY = {
+    "workflow": {"key": "value"},
+    "images": None,
+    "comfy_org_api_key": None,
+}
+_EXPECTED_WITH_IMAGES = {
+    "workflow": {"key": "value"},
+    "images": [{"name": "image1.png", "image": "base64string"}],
+    "comfy_org_api_key": None,
+}
+_EXPECTED_WITH_API_KEY = {
+    "workflow": {"key": "value"},
+    "images": None,
+    "comfy_org_api_key": "test-api-key-123",
+}
 
-    def test_valid_input_with_workflow_only(self):
-        input_data = {"workflow": {"key": "value"}}
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNone(error)
-        self.assertEqual(
-            validated_data,
-            {"workflow": {"key": "value"}, "images": None, "comfy_org_api_key": None},
-        )
 
-    def test_valid_input_with_workflow_and_images(self):
-        input_data = {
-            "workflow": {"key": "value"},
-            "images": [{"name": "image1.png", "image": "base64string"}],
-        }
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNone(error)
-        expected = {
-            "workflow": {"key": "value"},
-            "images": [{"name": "image1.png", "image": "base64string"}],
-            "comfy_org_api_key": None,
-        }
-        self.assertEqual(validated_data, expected)
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
 
-    def test_valid_input_with_comfy_org_api_key(self):
-        input_data = {
-            "workflow": {"key": "value"},
-            "comfy_org_api_key": "test-api-key-123",
-        }
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNone(error)
-        expected = {
-            "workflow": {"key": "value"},
-            "images": None,
-            "comfy_org_api_key": "test-api-key-123",
-        }
-        self.assertEqual(validated_data, expected)
-
-    def test_input_missing_workflow(self):
-        input_data = {"images": [{"name": "image1.png", "image": "base64string"}]}
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNotNone(error)
-        self.assertEqual(error, "Missing 'workflow' parameter")
-
-    def test_input_with_invalid_images_structure(self):
-        input_data = {
-            "workflow": {"key": "value"},
-            "images": [{"name": "image1.png"}],  # Missing 'image' key
-        }
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNotNone(error)
-        self.assertEqual(
-            error, "'images' must be a list of objects with 'name' and 'image' keys"
-        )
 
-    def test_invalid_json_string_input(self):
-        input_data = "invalid json"
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNotNone(error)
-        self.assertEqual(error, "Invalid JSON format in input")
-
-    def test_valid_json_string_input(self):
-        input_data = '{"workflow": {"key": "value"}}'
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNone(error)
-        self.assertEqual(
-            validated_data,
-            {"workflow": {"key": "value"}, "images": None, "comfy_org_api_key": None},
-        )
+class _ExtraDataMatching:
+    """Compare equal to a JSON request body whose ``extra_data[key]`` is ``value``.
 
-    def test_empty_input(self):
-        input_data = None
-        validated_data, error = handler.validate_input(input_data)
-        self.assertIsNotNone(error)
-        self.assertEqual(error, "Please provide input")
-
-
-class TestCheckServer(unittest.TestCase):
-    """Tests for the check_server function."""
-
-    @patch("handler.requests.get")
-    def test_check_server_server_up(self, mock_requests):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_requests.return_value = mock_response
-
-        result = handler.check_server("http://127.0.0.1:8188", 1, 50)
-        self.assertTrue(result)
-
-    @patch("handler.requests.get")
-    def test_check_server_server_down(self, mock_requests):
-        mock_requests.side_effect = handler.requests.RequestException()
-        result = handler.check_server("http://127.0.0.1:8188", 1, 50)
-        self.assertFalse(result)
-
-    @patch("handler.requests.get")
-    def test_check_server_timeout(self, mock_requests):
-        mock_requests.side_effect = handler.requests.Timeout()
-        result = handler.check_server("http://127.0.0.1:8188", 1, 50)
-        self.assertFalse(result)
-
-
-class TestQueueWorkflow(unittest.TestCase):
-    """Tests for the queue_workflow function."""
-
-    @patch("handler.requests.post")
-    def test_queue_workflow_success(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"prompt_id": "123"}
-        mock_post.return_value = mock_response
-
-        result = handler.queue_workflow({"prompt": "test"}, "client-id-123")
-        self.assertEqual(result, {"prompt_id": "123"})
-
-    @patch("handler.requests.post")
-    @patch("handler.get_available_models")
-    def test_queue_workflow_validation_error(self, mock_get_models, mock_post):
-        mock_get_models.return_value = {"checkpoints": ["model1.safetensors"]}
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_response.text = '{"error": "validation failed"}'
-        mock_response.json.return_value = {"error": "validation failed"}
-        mock_post.return_value = mock_response
-
-        with self.assertRaises(ValueError):
-            handler.queue_workflow({"prompt": "test"}, "client-id-123")
-
-    @patch("handler.requests.post")
-    def test_queue_workflow_with_api_key(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"prompt_id": "123"}
-        mock_post.return_value = mock_response
-
-        result = handler.queue_workflow(
-            {"prompt": "test"}, "client-id-123", comfy_org_api_key="test-key"
-        )
+    Lets a test compare a captured request body against the expectation
+    without decoding and indexing into it by hand.
+    """
 
-        # Verify the API key was included in the payload
-        call_args = mock_post.call_args
-        payload = json.loads(call_args.kwargs["data"])
-        self.assertEqual(payload["extra_data"]["api_key_comfy_org"], "test-key")
-        self.assertEqual(result, {"prompt_id": "123"})
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
 
+    def __eq__(self, other):
+        return json.loads(other).get("extra_data", {}).get(self.key) == self.value
 
-class TestGetHistory(unittest.TestCase):
-    """Tests for the get_history function."""
+    def __repr__(self):
+        return f"<JSON body with extra_data[{self.key!r}] == {self.value!r}>"
 
-    @patch("handler.requests.get")
-    def test_get_history_success(self, mock_get):
-        mock_response = MagicMock()
-        mock_response.json.return_value = {"key": "value"}
-        mock_get.return_value = mock_response
 
-        result = handler.get_history("123")
+@pytest.fixture(scope="module")
+def single_image():
+    """One plain base64 image entry; a tuple so tests cannot grow it."""
+    return ({"name": "test_image.png", "image": _TEST_IMAGE_B64},)
 
-        self.assertEqual(result, {"key": "value"})
-        mock_get.assert_called_with(
-            "http://127.0.0.1:8188/history/123", timeout=30
-        )
+
+@pytest.fixture(autouse=True)
+def mock_get(monkeypatch):
+    """Replace ``requests.get`` as seen by handler with a mock.
+
+    Applied to every test in the module so nothing can reach the network;
+    tests that need to configure it take ``mock_get`` as an argument.
+    """
+    mock = Mock()
+    monkeypatch.setattr(handler.requests, "get", mock)
+    return mock
+
+
+@pytest.fixture
+def mock_post(monkeypatch):
+    """Replace ``requests.post`` as seen by handler with a mock."""
+    mock = Mock()
+    monkeypatch.setattr(handler.requests, "post", mock)
+    return mock
+
+
+# ---------------------------------------------------------------------------
+# validate_input
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    "input_data,expected_data,expected_error",
+    [
+        pytest.param(
+            {"workflow": {"key": "value"}},
+            _EXPECTED_WORKFLOW_ONLY,
+            None,
+            id="workflow_only",
+        ),
+        pytest.param(
+            {
+                "workflow": {"key": "value"},
+                "images": [{"name": "image1.png", "image": "base64string"}],
+            },
+            _EXPECTED_WITH_IMAGES,
+            None,
+            id="workflow_and_images",
+        ),
+        pytest.param(
+            {"workflow": {"key": "value"}, "comfy_org_api_key": "test-api-key-123"},
+            _EXPECTED_WITH_API_KEY,
+            None,
+            id="comfy_org_api_key",
+        ),
+        pytest.param(
+            '{"workflow": {"key": "value"}}',
+            _EXPECTED_WORKFLOW_ONLY,
+            None,
+            id="valid_json_string",
+        ),
+        pytest.param(
+            {"images": [{"name": "image1.png", "image": "base64string"}]},
+            None,
+            "Missing 'workflow' parameter",
+            id="missing_workflow",
+        ),
+        pytest.param(
+            # Missing 'image' key
+            {"workflow": {"key": "value"}, "images": [{"name": "image1.png"}]},
+            None,
+            "'images' must be a list of objects with 'name' and 'image' keys",
+            id="invalid_images_structure",
+        ),
+        pytest.param(
+            "invalid json", None, "Invalid JSON format in input", id="invalid_json_string"
+        ),
+        pytest.param(None, None, "Please provide input", id="empty_input"),
+    ],
+)
+def test_validate_input(input_data, expected_data, expected_error):
+    validated_data, error = handler.validate_input(input_data)
+    assert error == expected_error
+    assert validated_data == expected_data
+
+
+# ---------------------------------------------------------------------------
+# check_server
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    "side_effect,expected",
+    [
+        pytest.param(None, True, id="server_up"),
+        pytest.param(handler.requests.RequestException(), False, id="server_down"),
+        pytest.param(handler.requests.Timeout(), False, id="timeout"),
+    ],
+)
+def test_check_server(mock_get, side_effect, expected):
+    mock_get.return_value = make_response()
+    mock_get.side_effect = side_effect
+
+    result = handler.check_server("http://127.0.0.1:8188", 1, 50)
+    assert result is expected
+
+
+# ---------------------------------------------------------------------------
+# queue_workflow
+# ---------------------------------------------------------------------------
+
+
+def test_queue_workflow_success(mock_post):
+    mock_post.return_value = make_response(json_data={"prompt_id": "123"})
+
+    result = handler.queue_workflow({"prompt": "test"}, "client-id-123")
+    assert result == {"prompt_id": "123"}
 
 
-class TestGetImageData(unittest.TestCase):
-    """Tests for the get_image_data function."""
+def test_queue_workflow_validation_error(monkeypatch, mock_post):
+    monkeypatch.setattr(
+        handler,
+        "get_available_models",
+        Mock(return_value={"checkpoints": ["model1.safetensors"]}),
+    )
+    mock_post.return_value = make_response(
+        status_code=400,
+        json_data={"error": "validation failed"},
+        text='{"error": "validation failed"}',
+    )
 
-    @patch("handler.requests.get")
-    def test_get_image_data_success(self, mock_get):
-        mock_response = MagicMock()
-        mock_response.content = b"image_bytes"
-        mock_get.return_value = mock_response
+    with pytest.raises(ValueError):
+        handler.queue_workflow({"prompt": "test"}, "client-id-123")
 
-        result = handler.get_image_data("test.png", "subfolder", "output")
 
-        self.assertEqual(result, b"image_bytes")
+def test_queue_workflow_with_api_key(monkeypatch):
+    # A plain function instead of a Mock: only the request kwargs are needed,
+    # so there is no point recording full call objects.
+    captured = []
 
-    @patch("handler.requests.get")
-    def test_get_image_data_timeout(self, mock_get):
-        mock_get.side_effect = handler.requests.Timeout()
+    def fake_post(url, **kwargs):
+        captured.append(kwargs)
+        return make_response(json_data={"prompt_id": "123"})
 
-        result = handler.get_image_data("test.png", "subfolder", "output")
+    monkeypatch.setattr(handler.requests, "post", fake_post)
 
-        self.assertIsNone(result)
+    result = handler.queue_workflow(
+        {"prompt": "test"}, "client-id-123", comfy_org_api_key="test-key"
+    )
 
-    @patch("handler.requests.get")
-    def test_get_image_data_request_error(self, mock_get):
-        mock_get.side_effect = handler.requests.RequestException("error")
+    # Verify the API key was included in the payload
+    assert len(captured) == 1
+    assert captured[0]["data"] == _ExtraDataMatching("api_key_comfy_org", "test-key")
+    assert result == {"prompt_id": "123"}
 
-        result = handler.get_image_data("test.png", "subfolder", "output")
 
-        self.assertIsNone(result)
+# ---------------------------------------------------------------------------
+# get_history
+# ---------------------------------------------------------------------------
 
 
-class TestUploadImages(unittest.TestCase):
-    """Tests for the upload_images function."""
+def test_get_history_success(mock_get):
+    mock_get.return_value = make_response(json_data={"key": "value"})
 
-    @patch("handler.requests.post")
-    def test_upload_images_successful(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.raise_for_status = MagicMock()
-        mock_post.return_value = mock_response
+    result = handler.get_history("123")
 
-        test_image_data = base64.b64encode(b"Test Image Data").decode("utf-8")
-        images = [{"name": "test_image.png", "image": test_image_data}]
+    assert result == {"key": "value"}
+    mock_get.assert_called_with("http://127.0.0.1:8188/history/123", timeout=30)
 
-        result = handler.upload_images(images)
 
-        self.assertEqual(result["status"], "success")
-        self.assertEqual(result["message"], "All images uploaded successfully")
+# ---------------------------------------------------------------------------
+# get_image_data
+# ---------------------------------------------------------------------------
 
-    @patch("handler.requests.post")
-    def test_upload_images_with_data_uri_prefix(self, mock_post):
-        """Test that data URI prefix is properly stripped."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.raise_for_status = MagicMock()
-        mock_post.return_value = mock_response
 
-        test_image_data = base64.b64encode(b"Test Image Data").decode("utf-8")
-        images = [
-            {"name": "test_image.png", "image": f"data:image/png;base64,{test_image_data}"}
-        ]
+@pytest.mark.parametrize(
+    "side_effect,expected",
+    [
+        pytest.param(None, b"image_bytes", id="success"),
+        pytest.param(handler.requests.Timeout(), None, id="timeout"),
+        pytest.param(
+            handler.requests.RequestException("error"), None, id="request_error"
+        ),
+    ],
+)
+def test_get_image_data(mock_get, side_effect, expected):
+    mock_get.return_value = make_response(content=b"image_bytes")
+    mock_get.side_effect = side_effect
 
-        result = handler.upload_images(images)
+    result = handler.get_image_data("test.png", "subfolder", "output")
 
-        self.assertEqual(result["status"], "success")
+    assert result == expected
 
-    @patch("handler.requests.post")
-    def test_upload_images_failed(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_response.raise_for_status.side_effect = handler.requests.HTTPError("Error")
-        mock_post.return_value = mock_response
 
-        test_image_data = base64.b64encode(b"Test Image Data").decode("utf-8")
-        images = [{"name": "test_image.png", "image": test_image_data}]
+# ---------------------------------------------------------------------------
+# upload_images
+# ---------------------------------------------------------------------------
 
-        result = handler.upload_images(images)
 
-        self.assertEqual(result["status"], "error")
+def test_upload_images_successful(mock_post, single_image):
+    mock_post.return_value = make_response()
 
-    def test_upload_images_empty_list(self):
-        result = handler.upload_images([])
+    result = handler.upload_images(single_image)
 
-        self.assertEqual(result["status"], "success")
-        self.assertEqual(result["message"], "No images to upload")
+    assert result["status"] == "success"
+    assert result["message"] == "All images uploaded successfully"
 
-    def test_upload_images_none(self):
-        result = handler.upload_images(None)
 
-        self.assertEqual(result["status"], "success")
-        self.assertEqual(result["message"], "No images to upload")
+def test_upload_images_with_data_uri_prefix(mock_post):
+    """Test that data URI prefix is properly stripped."""
+    mock_post.return_value = make_response()
 
-    @patch("handler.requests.post")
-    def test_upload_images_invalid_base64(self, mock_post):
-        """Test handling of invalid base64 data."""
-        images = [{"name": "test_image.png", "image": "not-valid-base64!@#$"}]
+    images = [{"name": "test_image.png", "image": _TEST_IMAGE_DATA_URI}]
 
-        result = handler.upload_images(images)
+    result = handler.upload_images(images)
 
-        self.assertEqual(result["status"], "error")
+    assert result["status"] == "success"
 
 
-class TestGetAvailableModels(unittest.TestCase):
-    """Tests for the get_available_models function."""
+def test_upload_images_failed(mock_post, single_image):
+    mock_post.return_value = make_response(
+        status_code=400, raise_exc=handler.requests.HTTPError("Error")
+    )
 
-    @patch("handler.requests.get")
-    def test_get_available_models_success(self, mock_get):
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
-            "CheckpointLoaderSimple": {
-                "input": {
-                    "required": {
-                        "ckpt_name": [["model1.safetensors", "model2.safetensors"]]
-                    }
+    result = handler.upload_images(single_image)
+
+    assert result["status"] == "error"
+
+
+@pytest.mark.parametrize("images", [[], None], ids=["empty_list", "none"])
+def test_upload_images_nothing_to_upload(images):
+    result = handler.upload_images(images)
+
+    assert result["status"] == "success"
+    assert result["message"] == "No images to upload"
+
+
+def test_upload_images_invalid_base64(mock_post):
+    """Test handling of invalid base64 data."""
+    images = [{"name": "test_image.png", "image": "not-valid-base64!@#$"}]
+
+    result = handler.upload_images(images)
+
+    assert result["status"] == "error"
+
+
+# ---------------------------------------------------------------------------
+# get_available_models
+# ---------------------------------------------------------------------------
+
+
+def test_get_available_models_success(mock_get):
+    object_info = {
+        "CheckpointLoaderSimple": {
+            "input": {
+                "required": {
+                    "ckpt_name": [["model1.safetensors", "model2.safetensors"]]
                 }
             }
         }
-        mock_get.return_value = mock_response
+    }
+    mock_get.return_value = make_response(json_data=object_info)
 
-        result = handler.get_available_models()
+    result = handler.get_available_models()
 
-        self.assertEqual(
-            result["checkpoints"], ["model1.safetensors", "model2.safetensors"]
-        )
+    assert result["checkpoints"] == ["model1.safetensors", "model2.safetensors"]
 
-    @patch("handler.requests.get")
-    def test_get_available_models_error(self, mock_get):
-        mock_get.side_effect = Exception("Network error")
 
-        result = handler.get_available_models()
+def test_get_available_models_error(mock_get):
+    mock_get.side_effect = Exception("Network error")
 
-        self.assertEqual(result, {})
+    result = handler.get_available_models()
 
+    assert result == {}
 
-class TestComfyServerStatus(unittest.TestCase):
-    """Tests for the _comfy_server_status function."""
 
-    @patch("handler.requests.get")
-    def test_comfy_server_status_reachable(self, mock_get):
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_get.return_value = mock_response
+# ---------------------------------------------------------------------------
+# _comfy_server_status
+# ---------------------------------------------------------------------------
 
-        result = handler._comfy_server_status()
 
-        self.assertTrue(result["reachable"])
-        self.assertEqual(result["status_code"], 200)
+def test_comfy_server_status_reachable(mock_get):
+    mock_get.return_value = make_response()
 
-    @patch("handler.requests.get")
-    def test_comfy_server_status_unreachable(self, mock_get):
-        mock_get.side_effect = Exception("Connection refused")
+    result = handler._comfy_server_status()
 
-        result = handler._comfy_server_status()
+    assert result["reachable"] is True
+    assert result["status_code"] == 200
 
-        self.assertFalse(result["reachable"])
-        self.assertIn("error", result)
 
+def test_comfy_server_status_unreachable(mock_get):
+    mock_get.side_effect = Exception("Connection refused")
 
-class TestAttemptWebsocketReconnect(unittest.TestCase):
-    """Tests for the _attempt_websocket_reconnect function."""
+    result = handler._comfy_server_status()
 
-    @patch("handler._comfy_server_status")
-    @patch("handler.websocket.WebSocket")
-    def test_reconnect_success(self, mock_ws_class, mock_server_status):
-        mock_server_status.return_value = {"reachable": True, "status_code": 200}
-        mock_ws_instance = MagicMock()
-        mock_ws_class.return_value = mock_ws_instance
+    assert result == {"reachable": False, "error": "Connection refused"}
 
-        result = handler._attempt_websocket_reconnect(
-            "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
-        )
 
-        self.assertEqual(result, mock_ws_instance)
-        mock_ws_instance.connect.assert_called_once()
-
-    @patch("handler._comfy_server_status")
-    @patch("handler.websocket.WebSocket")
-    def test_reconnect_server_unreachable(self, mock_ws_class, mock_server_status):
-        mock_server_status.return_value = {"reachable": False, "error": "connection refused"}
-
-        with self.assertRaises(handler.websocket.WebSocketConnectionClosedException):
-            handler._attempt_websocket_reconnect(
-                "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
-            )
-
-    @patch("handler._comfy_server_status")
-    @patch("handler.websocket.WebSocket")
-    @patch("handler.time.sleep")
-    def test_reconnect_retry_then_success(self, mock_sleep, mock_ws_class, mock_server_status):
-        mock_server_status.return_value = {"reachable": True, "status_code": 200}
-        mock_ws_instance = MagicMock()
-        mock_ws_class.return_value = mock_ws_instance
-        # First attempt fails, second succeeds
-        mock_ws_instance.connect.side_effect = [
-            handler.websocket.WebSocketException("fail"),
-            None,
-        ]
+# ---------------------------------------------------------------------------
+# _attempt_websocket_reconnect
+# ---------------------------------------------------------------------------
 
-        result = handler._attempt_websocket_reconnect(
-            "ws://127.0.0.1:8188/ws?clientId=test", 3, 1, Exception("initial")
-        )
 
-        self.assertEqual(result, mock_ws_instance)
-        self.assertEqual(mock_ws_instance.connect.call_count, 2)
-        mock_sleep.assert_called_once_with(1)
+@pytest.fixture
+def ws_instance(monkeypatch):
+    """Make every ``websocket.WebSocket()`` created by handler return this mock."""
+    instance = Mock()
+    monkeypatch.setattr(handler.websocket, "WebSocket", Mock(return_value=instance))
+    return instance
 
-    @patch("handler._comfy_server_status")
-    @patch("handler.websocket.WebSocket")
-    @patch("handler.time.sleep")
-    def test_reconnect_all_attempts_fail(self, mock_sleep, mock_ws_class, mock_server_status):
-        mock_server_status.return_value = {"reachable": True, "status_code": 200}
-        mock_ws_instance = MagicMock()
-        mock_ws_class.return_value = mock_ws_instance
-        mock_ws_instance.connect.side_effect = handler.websocket.WebSocketException("fail")
 
-        with self.assertRaises(handler.websocket.WebSocketConnectionClosedException):
-            handler._attempt_websocket_reconnect(
-                "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
-            )
+def _set_server_status(monkeypatch, status):
+    monkeypatch.setattr(handler, "_comfy_server_status", Mock(return_value=status))
 
-        self.assertEqual(mock_ws_instance.connect.call_count, 3)
 
+def test_reconnect_success(monkeypatch, ws_instance):
+    _set_server_status(monkeypatch, {"reachable": True, "status_code": 200})
 
-class TestHandlerFunction(unittest.TestCase):
-    """Tests for the main handler function."""
+    result = handler._attempt_websocket_reconnect(
+        "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
+    )
 
-    @patch("handler.check_server")
-    @patch("handler.validate_input")
-    def test_handler_invalid_input(self, mock_validate, mock_check_server):
-        mock_validate.return_value = (None, "Missing 'workflow' parameter")
+    assert result == ws_instance
+    ws_instance.connect.assert_called_once()
 
-        job = {"id": "test-job-123", "input": {}}
-        result = handler.handler(job)
 
-        self.assertEqual(result, {"error": "Missing 'workflow' parameter"})
+def test_reconnect_server_unreachable(monkeypatch, ws_instance):
+    _set_server_status(monkeypatch, {"reachable": False, "error": "connection refused"})
 
-    @patch("handler.check_server")
-    @patch("handler.validate_input")
-    def test_handler_server_unavailable(self, mock_validate, mock_check_server):
-        mock_validate.return_value = ({"workflow": {}, "images": None, "comfy_org_api_key": None}, None)
-        mock_check_server.return_value = False
+    with pytest.raises(handler.websocket.WebSocketConnectionClosedException):
+        handler._attempt_websocket_reconnect(
+            "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
+        )
 
-        job = {"id": "test-job-123", "input": {"workflow": {}}}
-        result = handler.handler(job)
 
-        self.assertIn("error", result)
-        self.assertIn("not reachable", result["error"])
+def test_reconnect_retry_then_success(monkeypatch, ws_instance, no_sleep):
+    _set_server_status(monkeypatch, {"reachable": True, "status_code": 200})
+    # First attempt fails, second succeeds
+    ws_instance.connect.side_effect = [
+        handler.websocket.WebSocketException("fail"),
+        None,
+    ]
 
-    @patch("handler.check_server")
-    @patch("handler.validate_input")
-    @patch("handler.upload_images")
-    def test_handler_upload_images_failure(self, mock_upload, mock_validate, mock_check_server):
-        mock_validate.return_value = (
-            {"workflow": {}, "images": [{"name": "test.png", "image": "data"}], "comfy_org_api_key": None},
-            None,
+    result = handler._attempt_websocket_reconnect(
+        "ws://127.0.0.1:8188/ws?clientId=test", 3, 1, Exception("initial")
+    )
+
+    assert result == ws_instance
+    assert ws_instance.connect.call_count == 2
+    no_sleep.assert_called_once_with(1)
+
+
+def test_reconnect_all_attempts_fail(monkeypatch, ws_instance):
+    _set_server_status(monkeypatch, {"reachable": True, "status_code": 200})
+    ws_instance.connect.side_effect = handler.websocket.WebSocketException("fail")
+
+    with pytest.raises(handler.websocket.WebSocketConnectionClosedException):
+        handler._attempt_websocket_reconnect(
+            "ws://127.0.0.1:8188/ws?clientId=test", 3, 0, Exception("initial")
         )
-        mock_check_server.return_value = True
-        mock_upload.return_value = {"status": "error", "details": ["upload failed"]}
 
-        job = {"id": "test-job-123", "input": {"workflow": {}, "images": [{"name": "test.png", "image": "data"}]}}
-        result = handler.handler(job)
+    assert ws_instance.connect.call_count == 3
+
 
-        self.assertIn("error", result)
-        self.assertEqual(result["error"], "Failed to upload one or more input images")
+# ---------------------------------------------------------------------------
+# handler
+# ---------------------------------------------------------------------------
 
 
-if __name__ == "__main__":
-    unittest.main()
+_IMAGES = [{"name": "test.png", "image": "data"}]
+
+# Exact error payloads returned by handler() when it bails out early
+_ERR_INVALID_INPUT = {"error": "Missing 'workflow' parameter"}
+_ERR_SERVER_UNREACHABLE = {
+    "error": "ComfyUI server (127.0.0.1:8188) not reachable after multiple retries."
+}
+_ERR_UPLOAD_FAILED = {
+    "error": "Failed to upload one or more input images",
+    "details": ["upload failed"],
+}
+
+
+@pytest.fixture
+def handler_deps(monkeypatch):
+    """Replace the functions handler() calls before talking to ComfyUI."""
+    deps = {
+        name: Mock()
+        for name in ("validate_input", "check_server", "upload_images")
+    }
+    for name, mock in deps.items():
+        monkeypatch.setattr(handler, name, mock)
+    return deps
+
+
+@pytest.mark.parametrize(
+    "validate_ret,check_ret,upload_ret,expected",
+    [
+        pytest.param(
+            (None, "Missing 'workflow' parameter"),
+            None,
+            None,
+            _ERR_INVALID_INPUT,
+            id="invalid_input",
+        ),
+        pytest.param(
+            ({"workflow": {}, "images": None, "comfy_org_api_key": None}, None),
+            False,
+            None,
+            _ERR_SERVER_UNREACHABLE,
+            id="server_unavailable",
+        ),
+        pytest.param(
+            ({"workflow": {}, "images": _IMAGES, "comfy_org_api_key": None}, None),
+            True,
+            {"status": "error", "details": ["upload failed"]},
+            _ERR_UPLOAD_FAILED,
+            id="upload_images_failure",
+        ),
+    ],
+)
+def test_handler_early_errors(
+    handler_deps, validate_ret, check_ret, upload_ret, expected
+):
+    handler_deps["validate_input"].return_value = validate_ret
+    handler_deps["check_server"].return_value = check_ret
+    handler_deps["upload_images"].return_value = upload_ret
+
+    job = {"id": "test-job-123", "input": {"workflow": {}, "images": _IMAGES}}
+    result = handler.handler(job)
+
+    assert result == expected